@@ -4,6 +4,18 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+import warnings
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import requests
 
 # --------------------------
 # 1. Configuración inicial
@@ -17,49 +29,169 @@ st.set_page_config(
 st.title("⛪ Dashboard de Consolidación - Personas Nuevas")
 st.markdown("---")
 
-# --------------------------
-# 2. Carga de datos
-# --------------------------
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def load_data(url):
-    """Carga y preprocesa los datos del Google Sheets"""
-    try:
-        df = pd.read_csv(url)
-        return df, None
-    except Exception as e:
-        return None, str(e)
+TTL_CACHE = 300  # Cache por 5 minutos
+MAX_BARRAS_SEMANALES = 500  # Por encima, el gráfico semanal se agrupa por mes
+MAX_OPCIONES_LIDER = 200  # Líderes listados en el filtro (los de más registros)
 
-# Input para la URL del Google Sheets
-with st.sidebar:
-    st.header("⚙️ Configuración")
-    sheet_url = st.text_input(
-        "URL del Google Sheets (formato CSV)",
-        value="https://docs.google.com/spreadsheets/d/e/TU_ID_AQUI/pub?gid=0&single=true&output=csv",
-        help="Ve a Google Sheets → Archivo → Compartir → Publicar en la web → CSV"
-    )
-    
-    if st.button("🔄 Actualizar datos"):
-        st.cache_data.clear()
+# Lector CSV opcional con Polars (USE_POLARS=1); sin el paquete se usa el de pyarrow
+USAR_POLARS = os.getenv("USE_POLARS", "").strip().lower() in {"1", "true", "yes"}
+if USAR_POLARS:
+    try:
+        import polars as pl
+    except ImportError:
+        USAR_POLARS = False
 
-# Cargar datos
-df, error = load_data(sheet_url)
+MESES_NOMBRES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+                 "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+DIAS_NOMBRES = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
 
-if error:
-    st.error(f"❌ Error al cargar datos: {error}")
-    st.info("Por favor, verifica que la URL sea correcta y que el Google Sheets esté publicado como CSV.")
-    st.stop()
+# Variantes aceptadas para las columnas que se detectan automáticamente
+POSIBLES_LIDERES = ["Líder Principal", "LIDER DE DOCE", "Lider Principal", "LÍDER PRINCIPAL"]
+POSIBLES_REUNIONES = ["¿A qué reunión viniste?", "¿A que reunión viniste?", "Reunión", "REUNION"]
+POSIBLES_NOTAS = [
+    "Nota respecto a la Llamada y Visita",
+    "Nota respecto a la llamada y visita", 
+    "Notas",
+    "Observaciones",
+    "Comentarios"
+]
+COLUMNAS_SINO = [
+    "Llamada realizada y contestada (SI/NO)",
+    "Ubicado en célula o Grupo Go! (SI/NO)", 
+    "Visita realizada (SI/NO)"
+]
+# Indicadores int8 (1 = "SI") derivados de COLUMNAS_SINO, en el mismo orden
+INDICADORES_SINO = ["_call_si", "_cell_si", "_visit_si"]
 
-if df is None or df.empty:
-    st.warning("⚠️ No se pudieron cargar los datos o están vacíos.")
-    st.stop()
+# Columnas que usa el dashboard; el resto del Google Sheets no se carga
+COLUMNAS_USADAS = {
+    "Marca temporal",
+    "Nombres y apellidos completos",
+    "No. de Celular",
+    "Tú eres:",
+    "Quién te Invito?",
+    "¿En qué barrio vives?",
+    *COLUMNAS_SINO,
+    *POSIBLES_LIDERES,
+    *POSIBLES_REUNIONES,
+    *POSIBLES_NOTAS
+}
 
 # --------------------------
-# 3. Preprocesamiento de datos
+# 2. Carga y preprocesamiento de datos
 # --------------------------
-@st.cache_data
-def preprocess_data(df):
-    """Preprocesa y limpia los datos"""
-    df = df.copy()
+def parse_timestamps(textos):
+    """Convierte textos de fecha (día primero) a datetime; los inválidos quedan como NaT"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        
+        # dd/mm/aaaa -> aaaa-mm-dd con una sustitución vectorizada; así una sola pasada del
+        # parser ISO 8601 en C cubre las fechas con y sin hora
+        texto_iso = textos.astype("string").str.strip().str.replace(
+            r"^(\d{1,2})/(\d{1,2})/(\d{4})", r"\3-\2-\1", regex=True
+        )
+        fechas = pd.to_datetime(texto_iso, format="ISO8601", errors="coerce")
+        residuales = fechas.isna() & textos.notna()
+        
+        # Lo que quede se procesa con día primero
+        if residuales.any():
+            fechas = fechas.fillna(pd.to_datetime(
+                textos[residuales], format="mixed", dayfirst=True, errors="coerce"
+            ))
+    return fechas
+
+def to_arrow_strings(serie):
+    """Columna como arreglo Arrow de texto (sin copia si ya está respaldada por Arrow)"""
+    return pc.cast(pa.array(serie, from_pandas=True), pa.string())
+
+def fetch_csv_bytes(url):
+    """Descarga el archivo (CSV o Parquet); también acepta una ruta local"""
+    # Sin caché propia: su único consumidor es load_and_preprocess, que ya se cachea
+    if url.startswith(("http://", "https://")):
+        respuesta = requests.get(url, timeout=30)
+        respuesta.raise_for_status()
+        return respuesta.content
+    with open(url, "rb") as f:
+        return f.read()
+
+def rutas_cache_local(url):
+    """Rutas del Parquet y de sus metadatos guardados en disco para una URL"""
+    clave = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(tempfile.gettempdir(), f"cons_{clave}")
+    return f"{base}.parquet", f"{base}.json"
+
+def borrar_cache_local(url):
+    """Elimina la copia Parquet de una URL para forzar una nueva descarga"""
+    for ruta in rutas_cache_local(url):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+@st.cache_data(ttl=TTL_CACHE)
+def load_and_preprocess(url):
+    """Carga y preprocesa los datos del Google Sheets"""
+    # Reutilizar la copia Parquet local si todavía está vigente
+    ruta_parquet, ruta_meta = rutas_cache_local(url)
+    if os.path.exists(ruta_parquet) and time.time() - os.path.getmtime(ruta_parquet) < TTL_CACHE:
+        try:
+            df = pd.read_parquet(ruta_parquet)
+            with open(ruta_meta, encoding="utf-8") as f:
+                meta = json.load(f)
+            return (df, meta["columna_lider"], meta["columna_reunion"], meta["columna_notas"],
+                    meta["fechas_originales"], meta["version_datos"], None)
+        except Exception:
+            pass  # Copia dañada o sin pyarrow: se descarga de nuevo
+    
+    try:
+        contenido = fetch_csv_bytes(url)
+        # Versión de los datos (URL + contenido): cambia solo si la hoja cambió y sirve
+        # como clave de las cachés que dependen del DataFrame cargado
+        version_datos = hashlib.sha1(url.encode("utf-8") + contenido).hexdigest()[:16]
+        if url.split("?")[0].lower().endswith(".parquet"):
+            # Exportación Parquet: el lector solo decodifica las columnas usadas y los tipos
+            # ya vienen guardados (la marca temporal puede llegar como timestamp)
+            encabezados = pq.read_schema(io.BytesIO(contenido)).names
+            columnas = [col for col in encabezados if col.strip() in COLUMNAS_USADAS] or None
+            tabla = pq.read_table(io.BytesIO(contenido), columns=columnas)
+            # Los timestamps quedan como datetime64 nativo; el resto respaldado por Arrow
+            df = tabla.to_pandas(
+                types_mapper=lambda tipo: None if pa.types.is_timestamp(tipo) else pd.ArrowDtype(tipo),
+                split_blocks=True, self_destruct=True
+            )
+            del tabla
+        elif USAR_POLARS:
+            # Lector multihilo de Polars, todo como texto (infer_schema_length=0); el
+            # preprocesamiento sigue en pandas sobre las mismas columnas respaldadas por Arrow
+            encabezados = pl.read_csv(io.BytesIO(contenido), n_rows=0).columns
+            columnas = [col for col in encabezados if col.strip() in COLUMNAS_USADAS] or None
+            df = pl.read_csv(
+                io.BytesIO(contenido), columns=columnas, infer_schema_length=0
+            ).to_pandas(use_pyarrow_extension_array=True)
+        else:
+            # Las notas son texto libre y pueden traer saltos de línea entre comillas
+            opciones_lectura = pv.ParseOptions(newlines_in_values=True)
+            # Leer solo el encabezado para elegir las columnas usadas (los nombres pueden traer espacios)
+            encabezados = pv.open_csv(io.BytesIO(contenido), parse_options=opciones_lectura).schema.names
+            columnas = [col for col in encabezados if col.strip() in COLUMNAS_USADAS]
+            # Sin columnas conocidas, include_columns=[] carga todas. Todo se lee como texto
+            # (equivalente a dtype=str): se evita la inferencia de tipos y el celular o la
+            # marca temporal no cambian de tipo según el contenido de la hoja
+            tabla = pv.read_csv(
+                io.BytesIO(contenido),
+                parse_options=opciones_lectura,
+                convert_options=pv.ConvertOptions(
+                    include_columns=columnas,
+                    column_types={col: pa.string() for col in columnas},
+                    strings_can_be_null=True
+                )
+            )
+            # Columnas respaldadas por Arrow; split_blocks/self_destruct liberan la tabla al convertir
+            df = tabla.to_pandas(types_mapper=pd.ArrowDtype, split_blocks=True, self_destruct=True)
+            del tabla
+    except Exception as e:
+        return None, None, None, None, [], None, str(e)
+    
+    if df.empty:
+        return df, None, None, None, [], version_datos, None
     
     # Limpiar nombres de columnas
     df.columns = df.columns.str.strip()
@@ -68,26 +200,21 @@ def preprocess_data(df):
     if "Nombres y apellidos completos" in df.columns:
         # Crear máscara para nombres válidos
         nombres_validos = df["Nombres y apellidos completos"].notna() & (df["Nombres y apellidos completos"].str.strip() != "")
-        df = df[nombres_validos].copy()
-        
-        # Mostrar cuántos registros se filtraron
-        registros_filtrados = len(df)
-        st.info(f"📋 **Registros con nombres válidos:** {registros_filtrados}")
-    else:
-        st.warning("⚠️ No se encontró la columna 'Nombres y apellidos completos'")
+        if not nombres_validos.all():
+            # El filtrado ya crea un DataFrame nuevo: basta una copia superficial (sin duplicar
+            # los datos) para poder añadir columnas sin SettingWithCopyWarning
+            df = df[nombres_validos].copy(deep=False)
     
     # Detectar automáticamente la columna de líder
     columna_lider = None
-    posibles_lideres = ["Líder Principal", "LIDER DE DOCE", "Lider Principal", "LÍDER PRINCIPAL"]
-    for col in posibles_lideres:
+    for col in POSIBLES_LIDERES:
         if col in df.columns:
             columna_lider = col
             break
     
     # Detectar columna de reunión
     columna_reunion = None
-    posibles_reuniones = ["¿A qué reunión viniste?", "¿A que reunión viniste?", "Reunión", "REUNION"]
-    for col in posibles_reuniones:
+    for col in POSIBLES_REUNIONES:
         if col in df.columns:
             columna_reunion = col
             df["Reunion"] = df[col].str.strip()
@@ -95,42 +222,34 @@ def preprocess_data(df):
     
     # Detectar columna de notas
     columna_notas = None
-    posibles_notas = [
-        "Nota respecto a la Llamada y Visita",
-        "Nota respecto a la llamada y visita", 
-        "Notas",
-        "Observaciones",
-        "Comentarios"
-    ]
-    for col in posibles_notas:
+    for col in POSIBLES_NOTAS:
         if col in df.columns:
             columna_notas = col
             break
     
     # Procesar fecha con formato día/mes/año
+    fechas_originales = []
     if "Marca temporal" in df.columns:
-        # Intentar primero con formato día/mes/año
-        df["Marca temporal"] = pd.to_datetime(df["Marca temporal"], format="%d/%m/%Y %H:%M:%S", errors="coerce")
-        
-        # Si hay valores nulos, intentar con otros formatos comunes
-        if df["Marca temporal"].isna().any():
-            mask_nulos = df["Marca temporal"].isna()
-            # Intentar formato día/mes/año sin hora
-            df.loc[mask_nulos, "Marca temporal"] = pd.to_datetime(
-                df.loc[mask_nulos, "Marca temporal"], format="%d/%m/%Y", errors="coerce"
-            )
-            # Si aún hay nulos, usar dayfirst=True (día primero)
-            if df["Marca temporal"].isna().any():
-                mask_nulos = df["Marca temporal"].isna()
-                df.loc[mask_nulos, "Marca temporal"] = pd.to_datetime(
-                    df.loc[mask_nulos, "Marca temporal"], dayfirst=True, errors="coerce"
-                )
+        fechas_texto = df["Marca temporal"]
+        # Muestra de textos originales para el panel de depuración
+        fechas_originales = fechas_texto.astype(str).head(10).tolist()
         
-        # Contar registros con fechas válidas vs inválidas
-        fechas_validas = df["Marca temporal"].notna().sum()
-        fechas_invalidas = df["Marca temporal"].isna().sum()
+        if pd.api.types.is_datetime64_any_dtype(fechas_texto):
+            # Viene tipada desde Parquet: no hay texto que convertir
+            fechas = fechas_texto.dt.tz_localize(None) if fechas_texto.dt.tz is not None else fechas_texto
+        else:
+            # Los envíos suelen repetir la misma marca temporal: si hay muchas repetidas,
+            # se convierten solo los textos únicos y se reconstruye la columna por código
+            codigos, textos_unicos = pd.factorize(fechas_texto)
+            if len(textos_unicos) < len(fechas_texto) * 0.5:
+                fechas_unicas = parse_timestamps(pd.Series(textos_unicos)).to_numpy()
+                # El código -1 (nulo) apunta al NaT añadido al final
+                fechas_unicas = np.append(fechas_unicas, np.datetime64("NaT"))
+                fechas = pd.Series(fechas_unicas[codigos], index=df.index)
+            else:
+                fechas = parse_timestamps(fechas_texto)
         
-        st.info(f"📅 **Procesamiento de fechas:** {fechas_validas} válidas, {fechas_invalidas} inválidas")
+        df["Marca temporal"] = fechas
         
         # NO eliminar filas sin fecha, mejor mantenerlas para análisis
         # df = df.dropna(subset=["Marca temporal"])
@@ -138,53 +257,68 @@ def preprocess_data(df):
         # Extraer información temporal solo para fechas válidas
         mask_fechas_validas = df["Marca temporal"].notna()
         
-        df["Año"] = df["Marca temporal"].dt.year
-        df["Mes"] = df["Marca temporal"].dt.month
-        df["Mes_Nombre"] = df["Marca temporal"].dt.strftime("%B")
-        df["Semana"] = df["Marca temporal"].dt.isocalendar().week
-        df["Dia_Semana"] = df["Marca temporal"].dt.day_name()
-        df["Fecha"] = df["Marca temporal"].dt.date
+        # Un solo accessor .dt y una sola inserción de columnas; los nombres de mes y día son
+        # categóricas construidas desde el número (código -1 = fecha inválida), sin strftime por fila
+        fechas_dt = df["Marca temporal"].dt
+        meses = fechas_dt.month
+        dia_semana = fechas_dt.dayofweek
+        df = df.assign(
+            Año=fechas_dt.year,
+            Mes=meses,
+            Mes_Nombre=pd.Categorical.from_codes(
+                meses.fillna(0).astype(int).to_numpy() - 1, categories=MESES_NOMBRES, ordered=True
+            ),
+            Semana=fechas_dt.isocalendar().week,
+            Dia_Semana=pd.Categorical.from_codes(
+                dia_semana.fillna(-1).astype(int).to_numpy(), categories=DIAS_NOMBRES, ordered=True
+            ),
+            Fecha=fechas_dt.normalize()
+        )
         
         # Identificar fines de semana (solo para fechas válidas)
         if mask_fechas_validas.any():
-            dias_semana_unicos = df.loc[mask_fechas_validas, "Marca temporal"].dt.dayofweek.unique()
-            tiene_entre_semana = any(dia < 5 for dia in dias_semana_unicos)
+            tiene_entre_semana = (dia_semana[mask_fechas_validas] < 5).any()
             
             if tiene_entre_semana:
-                df["Es_Fin_Semana"] = df["Marca temporal"].dt.dayofweek >= 5
+                df["Es_Fin_Semana"] = dia_semana >= 5
             else:
                 df["Es_Fin_Semana"] = True
     
-    # Normalizar columnas de SI/NO (más flexible)
-    columnas_sino = [
-        "Llamada realizada y contestada (SI/NO)",
-        "Ubicado en célula o Grupo Go! (SI/NO)", 
-        "Visita realizada (SI/NO)"
-    ]
+    # Normalizar columnas de SI/NO (más flexible): variaciones de "SÍ" y "NO" en un solo diccionario
+    normalizacion_sino = {
+        "SÍ": "SI",
+        "SÌ": "SI",  # Acento grave
+        "YES": "SI",
+        "Y": "SI",
+        "S": "SI",
+        "1": "SI",
+        "TRUE": "SI",
+        "N": "NO",
+        "0": "NO",
+        "FALSE": "NO",
+        "SIN GESTIÓN": "NO",
+        "SIN GESTION": "NO"
+    }
+    
+    claves_sino = pa.array(list(normalizacion_sino.keys()))
+    valores_sino = pa.array(list(normalizacion_sino.values()))
     
-    for col in columnas_sino:
+    for col in COLUMNAS_SINO:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-            # Normalizar diferentes variaciones de "SÍ"
-            df[col] = df[col].replace({
-                "SÍ": "SI", 
-                "SÌ": "SI",  # Acento grave
-                "SI": "SI",   # Ya correcto
-                "YES": "SI", 
-                "Y": "SI",
-                "S": "SI",
-                "1": "SI",
-                "TRUE": "SI"
-            })
-            # Normalizar "NO"
-            df[col] = df[col].replace({
-                "NO": "NO",   # Ya correcto
-                "N": "NO",
-                "0": "NO",
-                "FALSE": "NO",
-                "SIN GESTIÓN": "NO",
-                "SIN GESTION": "NO"
-            })
+            # Kernels de Arrow: recorte + mayúsculas y el diccionario como búsqueda exacta
+            # (index_in + take); lo no reconocido se conserva con coalesce
+            valores = pc.utf8_upper(pc.utf8_trim_whitespace(to_arrow_strings(df[col])))
+            valores = pc.coalesce(pc.take(valores_sino, pc.index_in(valores, value_set=claves_sino)), valores)
+            # Categórica con "SI"/"NO" primero; se conservan otros valores no reconocidos
+            otros_valores = sorted(set(pc.unique(valores).drop_null().to_pylist()) - {"SI", "NO"})
+            df[col] = pd.Categorical(valores.to_pandas(), categories=["SI", "NO"] + otros_valores)
+    
+    # Indicadores int8 (1 = "SI") para sumar sin lambdas por grupo
+    for col, indicador in zip(COLUMNAS_SINO, INDICADORES_SINO):
+        if col in df.columns:
+            df[indicador] = (df[col] == "SI").astype("int8")
+        else:
+            df[indicador] = np.int8(0)
     
     # Normalizar grupos de edad
     if "Tú eres:" in df.columns:
@@ -192,12 +326,75 @@ def preprocess_data(df):
     
     # Normalizar barrios
     if "¿En qué barrio vives?" in df.columns:
-        df["Barrio"] = df["¿En qué barrio vives?"].str.strip().str.title()
-        df["Barrio"] = df["Barrio"].fillna("No especificado")
+        # Recorte, formato título y relleno de nulos en kernels de Arrow, sin objetos Python
+        barrios = pc.utf8_title(pc.utf8_trim_whitespace(to_arrow_strings(df["¿En qué barrio vives?"])))
+        df["Barrio"] = pd.array(pc.fill_null(barrios, "No especificado"), dtype=pd.ArrowDtype(pa.string()))
+    
+    # Columnas de baja cardinalidad que se filtran en cada interacción:
+    # como categóricas, las comparaciones usan códigos enteros
+    for col in [columna_lider, "Grupo_Edad", "Reunion", "Barrio"]:
+        if col and col in df.columns:
+            df[col] = df[col].astype("category")
+    
+    # Guardar la copia Parquet (opcional: requiere pyarrow y columnas homogéneas)
+    try:
+        with open(ruta_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "columna_lider": columna_lider,
+                "columna_reunion": columna_reunion,
+                "columna_notas": columna_notas,
+                "fechas_originales": fechas_originales,
+                "version_datos": version_datos
+            }, f)
+        df.to_parquet(ruta_parquet, compression="zstd")
+    except Exception:
+        borrar_cache_local(url)
     
-    return df, columna_lider, columna_reunion, columna_notas
+    return df, columna_lider, columna_reunion, columna_notas, fechas_originales, version_datos, None
 
-df, columna_lider, columna_reunion, columna_notas = preprocess_data(df)
+# --------------------------
+# 3. Fuente de datos
+# --------------------------
+# Input para la URL del Google Sheets
+with st.sidebar:
+    st.header("⚙️ Configuración")
+    sheet_url = st.text_input(
+        "URL del Google Sheets (formato CSV)",
+        value="https://docs.google.com/spreadsheets/d/e/TU_ID_AQUI/pub?gid=0&single=true&output=csv",
+        help="Ve a Google Sheets → Archivo → Compartir → Publicar en la web → CSV. "
+             "También acepta una exportación .parquet (URL o ruta local)"
+    )
+    
+    if st.button("🔄 Actualizar datos"):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        borrar_cache_local(sheet_url)
+
+# Cargar y preprocesar datos (la caché se indexa solo por la URL)
+df, columna_lider, columna_reunion, columna_notas, fechas_originales, version_datos, error = load_and_preprocess(sheet_url)
+
+if error:
+    st.error(f"❌ Error al cargar datos: {error}")
+    st.info("Por favor, verifica que la URL sea correcta y que el Google Sheets esté publicado como CSV.")
+    st.stop()
+
+# Resumen del preprocesamiento: fuera de la función cacheada para que también se muestre
+# cuando los datos vienen de la copia Parquet local
+if df is not None and not df.empty:
+    if "Nombres y apellidos completos" in df.columns:
+        st.info(f"📋 **Registros con nombres válidos:** {len(df)}")
+    else:
+        st.warning("⚠️ No se encontró la columna 'Nombres y apellidos completos'")
+    
+    if "Marca temporal" in df.columns:
+        # Contar registros con fechas válidas vs inválidas
+        fechas_validas = df["Marca temporal"].notna().sum()
+        fechas_invalidas = df["Marca temporal"].isna().sum()
+        st.info(f"📅 **Procesamiento de fechas:** {fechas_validas} válidas, {fechas_invalidas} inválidas")
+
+if df is None or df.empty:
+    st.warning("⚠️ No se pudieron cargar los datos o están vacíos.")
+    st.stop()
 
 # --------------------------
 # 4. Información de datos y filtros
@@ -231,11 +428,28 @@ if not df.empty and "Marca temporal" in df.columns:
     else:
         st.warning("⚠️ No hay fechas válidas en los datos")
 
+# Valores únicos para los filtros: se calculan una vez por versión de los datos, no en cada interacción
+@st.cache_data(ttl=TTL_CACHE)
+def filter_options(_df, version_datos, columna_lider):
+    """Valores únicos (sin nulos) de las columnas usadas en los filtros"""
+    opciones = {}
+    for col in ["Año", "Mes", "Grupo_Edad", "Reunion", columna_lider]:
+        if col and col in _df.columns:
+            opciones[col] = _df[col].dropna().unique().tolist()
+    
+    # Con demasiados líderes el selectbox se vuelve lento: solo los de más registros
+    if columna_lider and len(opciones.get(columna_lider, [])) > MAX_OPCIONES_LIDER:
+        opciones["total_lideres"] = len(opciones[columna_lider])
+        opciones[columna_lider] = _df[columna_lider].value_counts().nlargest(MAX_OPCIONES_LIDER).index.tolist()
+    return opciones
+
+opciones_filtros = filter_options(df, version_datos, columna_lider)
+
 # Mostrar años disponibles (solo para fechas válidas)
 if "Año" in df.columns:
-    años_válidos = df["Año"].dropna()
-    if not años_válidos.empty:
-        años_únicos = sorted(años_válidos.unique())
+    años_válidos = opciones_filtros["Año"]
+    if años_válidos:
+        años_únicos = sorted(años_válidos)
         st.info(f"📆 **Años disponibles:** {', '.join(map(str, años_únicos))}")
     else:
         st.warning("⚠️ No se pudieron extraer años de las fechas")
@@ -245,10 +459,10 @@ with st.sidebar:
     
     # Filtro por año (permitir múltiples años)
     if "Año" in df.columns:
-        años_válidos = df["Año"].dropna()
-        if not años_válidos.empty:
+        años_válidos = opciones_filtros["Año"]
+        if años_válidos:
             # Convertir a enteros y filtrar valores válidos
-            años_disponibles = [int(a) for a in años_válidos.unique() if not pd.isna(a)]
+            años_disponibles = [int(a) for a in años_válidos if not pd.isna(a)]
             años_disponibles = sorted(años_disponibles)
             
             if años_disponibles:
@@ -269,13 +483,10 @@ with st.sidebar:
     
     # Filtro por rango de meses
     if "Mes" in df.columns:
-        meses_válidos = df["Mes"].dropna()
-        if not meses_válidos.empty:
-            meses_nombres = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-                            "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
-            
+        meses_válidos = opciones_filtros["Mes"]
+        if meses_válidos:
             # Convertir a enteros y filtrar valores válidos (1-12)
-            meses_disponibles = [int(m) for m in meses_válidos.unique() if 1 <= m <= 12]
+            meses_disponibles = [int(m) for m in meses_válidos if 1 <= m <= 12]
             meses_disponibles = sorted(meses_disponibles)
             
             if meses_disponibles:
@@ -284,15 +495,15 @@ with st.sidebar:
                 
                 if usar_filtro_meses:
                     mes_inicio = st.selectbox("🗓️ Mes inicio:", 
-                                             [meses_nombres[m-1] for m in meses_disponibles],
+                                             [MESES_NOMBRES[m-1] for m in meses_disponibles],
                                              index=0)
                     mes_fin = st.selectbox("🗓️ Mes fin:", 
-                                          [meses_nombres[m-1] for m in meses_disponibles],
+                                          [MESES_NOMBRES[m-1] for m in meses_disponibles],
                                           index=len(meses_disponibles)-1)
                     
                     # Convertir nombres a números
-                    mes_inicio_num = meses_nombres.index(mes_inicio) + 1
-                    mes_fin_num = meses_nombres.index(mes_fin) + 1
+                    mes_inicio_num = MESES_NOMBRES.index(mes_inicio) + 1
+                    mes_fin_num = MESES_NOMBRES.index(mes_fin) + 1
                 else:
                     # Sin filtro de meses - mostrar todos
                     mes_inicio = "Enero"
@@ -322,57 +533,167 @@ with st.sidebar:
     
     # Filtro por grupo de edad
     if "Grupo_Edad" in df.columns:
-        grupos = ["Todos"] + list(df["Grupo_Edad"].dropna().unique())
+        grupos = ["Todos"] + opciones_filtros["Grupo_Edad"]
         grupo_seleccionado = st.selectbox("👥 Grupo de edad:", grupos)
     else:
         grupo_seleccionado = "Todos"
     
     # Filtro por líder (dinámico según la base de datos)
     if columna_lider:
-        lideres = ["Todos"] + list(df[columna_lider].dropna().unique())
+        lideres = ["Todos"] + opciones_filtros[columna_lider]
         lider_seleccionado = st.selectbox(f"👨‍💼 {columna_lider}:", lideres)
+        if "total_lideres" in opciones_filtros:
+            st.caption(f"Se muestran los {MAX_OPCIONES_LIDER} de {opciones_filtros['total_lideres']} con más registros")
     else:
         lider_seleccionado = "Todos"
     
     # Filtro por reunión (nuevo)
     if columna_reunion:
-        reuniones = ["Todas"] + list(df["Reunion"].dropna().unique())
+        reuniones = ["Todas"] + opciones_filtros["Reunion"]
         reunion_seleccionada = st.selectbox("🏛️ Reunión:", reuniones)
     else:
         reunion_seleccionada = "Todas"
 
-# Aplicar filtros (solo a registros con fechas válidas para filtros temporales)
-df_filtrado = df.copy()
+def apply_filters(df, años_seleccionados, usar_filtro_meses, mes_inicio_num, mes_fin_num,
+                  grupo_seleccionado, lider_seleccionado, reunion_seleccionada,
+                  columna_lider, columna_reunion):
+    """Aplica los filtros de la barra lateral con una sola máscara y un único recorte"""
+    # Aplicar filtros (solo a registros con fechas válidas para filtros temporales)
+    mask = np.ones(len(df), dtype=bool)
+    
+    # Filtro por años (solo aplicar si hay años válidos)
+    if años_seleccionados and "Año" in df.columns:
+        # Mantener registros sin fecha + registros con años seleccionados
+        mask_sin_fecha = df["Año"].isna()
+        mask_años_seleccionados = df["Año"].isin(años_seleccionados)
+        mask &= (mask_sin_fecha | mask_años_seleccionados).to_numpy()
+    
+    # Filtro por meses (solo aplicar si está habilitado y hay fechas válidas)
+    if usar_filtro_meses and "Mes" in df.columns and not df["Mes"].isna().all():
+        mask_sin_fecha = df["Mes"].isna()
+        
+        if mes_inicio_num <= mes_fin_num:
+            mask_meses = (df["Mes"] >= mes_inicio_num) & (df["Mes"] <= mes_fin_num)
+        else:  # Caso donde el rango cruza el año
+            mask_meses = (df["Mes"] >= mes_inicio_num) | (df["Mes"] <= mes_fin_num)
+        
+        mask &= (mask_sin_fecha | mask_meses).to_numpy()
+    
+    # Filtro por grupo de edad
+    if grupo_seleccionado != "Todos" and "Grupo_Edad" in df.columns:
+        mask &= (df["Grupo_Edad"] == grupo_seleccionado).to_numpy()
+    
+    # Filtro por líder (dinámico)
+    if lider_seleccionado != "Todos" and columna_lider:
+        mask &= (df[columna_lider] == lider_seleccionado).to_numpy()
+    
+    # Filtro por reunión (nuevo)
+    if reunion_seleccionada != "Todas" and columna_reunion:
+        mask &= (df["Reunion"] == reunion_seleccionada).to_numpy()
+    
+    return df[mask]
+
+def monthly_agg(df):
+    """Personas nuevas por mes"""
+    mensual = df.groupby(["Mes", "Mes_Nombre"], sort=False, observed=True).size().reset_index(name="Nuevos")
+    return mensual.sort_values("Mes", ignore_index=True)
 
-# Filtro por años (solo aplicar si hay años válidos)
-if años_seleccionados and "Año" in df.columns:
-    # Mantener registros sin fecha + registros con años seleccionados
-    mask_sin_fecha = df["Año"].isna()
-    mask_años_seleccionados = df["Año"].isin(años_seleccionados)
-    df_filtrado = df_filtrado[mask_sin_fecha | mask_años_seleccionados]
+def format_periodo(años, numeros, separador):
+    """Etiquetas "2024-S05" / "2024-M05" con np.char sobre arreglos de ancho fijo"""
+    # Año llega como float ("2024.0"): pasar a entero antes de formatear.
+    # np.char.mod rellena con ceros y, a diferencia de np.char.zfill, acepta arreglos vacíos
+    años_txt = años.to_numpy(dtype=np.int32).astype("U4")
+    numeros_txt = np.char.mod("%02d", numeros.to_numpy(dtype=np.int32))
+    return np.char.add(np.char.add(años_txt, separador), numeros_txt)
 
-# Filtro por meses (solo aplicar si está habilitado y hay fechas válidas)
-if usar_filtro_meses and "Mes" in df.columns and not df["Mes"].isna().all():
-    mask_sin_fecha = df["Mes"].isna()
+def weekly_agg(df):
+    """Personas nuevas por semana"""
+    semanal = df.groupby(["Año", "Semana"], observed=True).size().reset_index(name="Nuevos")
+    if len(semanal) > MAX_BARRAS_SEMANALES:
+        # Demasiadas barras para el navegador: agrupar por mes mantiene el gráfico acotado
+        semanal = df.groupby(["Año", "Mes"], observed=True).size().reset_index(name="Nuevos")
+        semanal["Periodo"] = format_periodo(semanal["Año"], semanal["Mes"], "-M")
+        return semanal
+    semanal["Periodo"] = format_periodo(semanal["Año"], semanal["Semana"], "-S")
+    return semanal
+
+def category_counts(serie):
+    """Conteo de una columna categórica con np.bincount sobre sus códigos"""
+    codigos = serie.cat.codes.to_numpy()
+    conteos = np.bincount(codigos[codigos >= 0], minlength=len(serie.cat.categories))
+    conteo = pd.Series(conteos, index=serie.cat.categories)
+    return conteo[conteo > 0]
+
+def top_barrios(df):
+    """Top 10 de barrios"""
+    # Selección parcial con nlargest en lugar de ordenar todos los barrios
+    return category_counts(df["Barrio"]).nlargest(10)
+
+def group_stats(df, columna, etiqueta):
+    """Nuevos, llamadas, célula y visitas (con porcentajes) agrupados por una columna"""
+    # Todo con reductores vectorizados; "size" cuenta filas y _call_si siempre existe,
+    # así no depende de la columna de nombres
+    stats = df.groupby(columna, observed=True).agg(
+        Nuevos=("_call_si", "size"),
+        Llamadas=("_call_si", "sum"),
+        Célula=("_cell_si", "sum"),
+        Visitas=("_visit_si", "sum")
+    ).reset_index()
     
-    if mes_inicio_num <= mes_fin_num:
-        mask_meses = (df["Mes"] >= mes_inicio_num) & (df["Mes"] <= mes_fin_num)
-    else:  # Caso donde el rango cruza el año
-        mask_meses = (df["Mes"] >= mes_inicio_num) | (df["Mes"] <= mes_fin_num)
+    stats.columns = [etiqueta, "Nuevos", "Llamadas", "Célula", "Visitas"]
     
-    df_filtrado = df_filtrado[mask_sin_fecha | mask_meses]
+    # Calcular porcentajes
+    stats["% Llamadas"] = (stats["Llamadas"] / stats["Nuevos"] * 100).round(1)
+    stats["% Célula"] = (stats["Célula"] / stats["Nuevos"] * 100).round(1)
+    stats["% Visitas"] = (stats["Visitas"] / stats["Nuevos"] * 100).round(1)
+    return stats
 
-# Filtro por grupo de edad
-if grupo_seleccionado != "Todos" and "Grupo_Edad" in df.columns:
-    df_filtrado = df_filtrado[df_filtrado["Grupo_Edad"] == grupo_seleccionado]
+# Filtrado + agregaciones en una sola función cacheada: si la combinación de filtros
+# ya se calculó, Streamlit devuelve todo sin volver a recorrer los datos
+@st.cache_data(ttl=TTL_CACHE, max_entries=32)
+def compute_view(_df, clave, columna_lider, columna_reunion):
+    """Datos filtrados y todas las agregaciones de la vista para una clave de filtros"""
+    # La clave contiene la versión de los datos (identifica a _df, que no se hashea) y los filtros activos
+    _, años, usar_filtro_meses, mes_inicio_num, mes_fin_num, grupo, lider, reunion = clave
+    df_filtrado = apply_filters(
+        _df, list(años), usar_filtro_meses, mes_inicio_num, mes_fin_num,
+        grupo, lider, reunion, columna_lider, columna_reunion
+    )
+    
+    vista = {
+        "df_filtrado": df_filtrado,
+        # Una sola reducción sobre los indicadores int8
+        "totales": df_filtrado[INDICADORES_SINO].to_numpy().sum(axis=0).tolist(),
+        "mensual": monthly_agg(df_filtrado),
+        "semanal": weekly_agg(df_filtrado)
+    }
+    if columna_lider:
+        vista["lideres_stats"] = group_stats(df_filtrado, columna_lider, "Líder")
+    if "Grupo_Edad" in df_filtrado.columns:
+        vista["grupos_dist"] = category_counts(df_filtrado["Grupo_Edad"])
+    if "Barrio" in df_filtrado.columns:
+        vista["barrios_top"] = top_barrios(df_filtrado)
+    if columna_reunion:
+        vista["reunion_dist"] = category_counts(df_filtrado["Reunion"])
+        vista["reunion_stats"] = group_stats(df_filtrado, "Reunion", "Reunión")
+    return vista
 
-# Filtro por líder (dinámico)
-if lider_seleccionado != "Todos" and columna_lider:
-    df_filtrado = df_filtrado[df_filtrado[columna_lider] == lider_seleccionado]
+# Clave hashable con la versión de los datos y los filtros activos: identifica a
+# df_filtrado sin que Streamlit tenga que hashear el DataFrame completo. Con la URL sola,
+# tras una recarga se seguirían sirviendo vistas calculadas con los datos anteriores
+clave_filtros = (
+    version_datos,
+    tuple(años_seleccionados),
+    usar_filtro_meses,
+    mes_inicio_num,
+    mes_fin_num,
+    grupo_seleccionado,
+    lider_seleccionado,
+    reunion_seleccionada
+)
 
-# Filtro por reunión (nuevo)
-if reunion_seleccionada != "Todas" and columna_reunion:
-    df_filtrado = df_filtrado[df_filtrado["Reunion"] == reunion_seleccionada]
+vista = compute_view(df, clave_filtros, columna_lider, columna_reunion)
+df_filtrado = vista["df_filtrado"]
 
 # --------------------------
 # 5. Métricas principales
@@ -394,9 +715,7 @@ st.caption(rango_texto)
 col1, col2, col3, col4 = st.columns(4)
 
 total_personas = len(df_filtrado)
-total_llamadas = (df_filtrado.get("Llamada realizada y contestada (SI/NO)", pd.Series()) == "SI").sum()
-total_celula = (df_filtrado.get("Ubicado en célula o Grupo Go! (SI/NO)", pd.Series()) == "SI").sum()
-total_visita = (df_filtrado.get("Visita realizada (SI/NO)", pd.Series()) == "SI").sum()
+total_llamadas, total_celula, total_visita = vista["totales"]
 
 # Calcular porcentajes
 pct_llamadas = (total_llamadas / total_personas * 100) if total_personas > 0 else 0
@@ -411,16 +730,12 @@ col4.metric("🚪 Visitadas", f"{total_visita} ({pct_visita:.1f}%)")
 # --------------------------
 # 6. Gráficos de evolución temporal
 # --------------------------
-st.header("📈 Evolución Temporal")
-
-tab1, tab2, tab3 = st.tabs(["📅 Por Mes", "📊 Por Semana", "🎯 Consolidación"])
-
-with tab1:
-    # Gráfico mensual
-    mensual = df_filtrado.groupby(["Mes", "Mes_Nombre"]).size().reset_index(name="Nuevos")
-    mensual = mensual.sort_values("Mes")
-    
-    fig_mes = px.line(
+# Las figuras se construyen una sola vez por tabla agregada: st.cache_resource hashea
+# las tablas (pequeñas) y devuelve la misma figura en los reruns siguientes
+@st.cache_resource(ttl=TTL_CACHE, max_entries=64)
+def build_monthly_fig(mensual):
+    """Línea de personas nuevas por mes"""
+    fig = px.line(
         mensual, 
         x="Mes_Nombre", 
         y="Nuevos",
@@ -428,27 +743,86 @@ with tab1:
         markers=True,
         color_discrete_sequence=["#1f77b4"]
     )
-    fig_mes.update_layout(xaxis_title="Mes", yaxis_title="Cantidad")
-    st.plotly_chart(fig_mes, use_container_width=True)
+    fig.update_layout(xaxis_title="Mes", yaxis_title="Cantidad")
+    return fig
 
-with tab2:
-    # Gráfico semanal
-    semanal = df_filtrado.groupby(["Año", "Semana"]).size().reset_index(name="Nuevos")
-    semanal["Periodo"] = semanal["Año"].astype(str) + "-S" + semanal["Semana"].astype(str).str.zfill(2)
-    
-    fig_sem = px.bar(
+@st.cache_resource(ttl=TTL_CACHE, max_entries=64)
+def build_weekly_fig(semanal):
+    """Barras de personas nuevas por semana (o por mes si hay demasiadas semanas)"""
+    agrupado_por_mes = "Mes" in semanal.columns
+    fig = px.bar(
         semanal,
         x="Periodo",
         y="Nuevos", 
-        title="Personas Nuevas por Semana",
+        title="Personas Nuevas por Mes (demasiadas semanas para mostrar)" if agrupado_por_mes else "Personas Nuevas por Semana",
         color_discrete_sequence=["#2ca02c"]
     )
-    fig_sem.update_layout(
-        xaxis_title="Semana", 
+    fig.update_layout(
+        xaxis_title="Mes" if agrupado_por_mes else "Semana", 
         yaxis_title="Cantidad",
         xaxis_tickangle=45
     )
-    st.plotly_chart(fig_sem, use_container_width=True)
+    return fig
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=64)
+def build_funnel_fig(valores):
+    """Embudo de consolidación a partir de los totales"""
+    etapas = ["Personas Nuevas", "Llamadas", "En Célula", "Visitadas"]
+    fig = go.Figure(go.Funnel(
+        y=etapas,
+        x=list(valores),
+        textinfo="value+percent initial",
+        marker_color=["#3498db", "#e74c3c", "#f39c12", "#27ae60"]
+    ))
+    fig.update_layout(title="Embudo de Consolidación")
+    return fig
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=64)
+def build_group_fig(stats, etiqueta, titulo):
+    """Barras agrupadas de nuevos, llamadas, célula y visitas"""
+    fig = px.bar(
+        stats,
+        x=etiqueta,
+        y=["Nuevos", "Llamadas", "Célula", "Visitas"],
+        title=titulo,
+        barmode="group"
+    )
+    fig.update_layout(xaxis_title=etiqueta, yaxis_title="Cantidad")
+    return fig
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=64)
+def build_pie_fig(conteo, titulo):
+    """Torta a partir de un conteo por categoría"""
+    return px.pie(
+        values=conteo.values,
+        names=conteo.index,
+        title=titulo
+    )
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=64)
+def build_barrios_fig(barrios_top):
+    """Barras horizontales del top de barrios"""
+    return px.bar(
+        x=barrios_top.values,
+        y=barrios_top.index,
+        orientation="h",
+        title="Top 10 Barrios",
+        labels={"x": "Cantidad", "y": "Barrio"}
+    )
+
+st.header("📈 Evolución Temporal")
+
+tab1, tab2, tab3 = st.tabs(["📅 Por Mes", "📊 Por Semana", "🎯 Consolidación"])
+
+with tab1:
+    # Gráfico mensual
+    mensual = vista["mensual"]
+    st.plotly_chart(build_monthly_fig(mensual), use_container_width=True)
+
+with tab2:
+    # Gráfico semanal
+    semanal = vista["semanal"]
+    st.plotly_chart(build_weekly_fig(semanal), use_container_width=True)
     
     # Mostrar estadísticas adicionales si solo hay sábados
     if not df_filtrado.empty and "Dia_Semana" in df_filtrado.columns:
@@ -465,18 +839,8 @@ with tab2:
 
 with tab3:
     # Embudo de consolidación
-    etapas = ["Personas Nuevas", "Llamadas", "En Célula", "Visitadas"]
-    valores = [total_personas, total_llamadas, total_celula, total_visita]
-    
-    fig_embudo = go.Figure(go.Funnel(
-        y=etapas,
-        x=valores,
-        textinfo="value+percent initial",
-        marker_color=["#3498db", "#e74c3c", "#f39c12", "#27ae60"]
-    ))
-    
-    fig_embudo.update_layout(title="Embudo de Consolidación")
-    st.plotly_chart(fig_embudo, use_container_width=True)
+    valores = (total_personas, total_llamadas, total_celula, total_visita)
+    st.plotly_chart(build_funnel_fig(valores), use_container_width=True)
 
 # --------------------------
 # 7. Análisis por líder
@@ -484,33 +848,14 @@ with tab3:
 if columna_lider:
     st.header(f"👨‍💼 Análisis por {columna_lider}")
     
-    # Crear métricas por líder
-    lideres_stats = df_filtrado.groupby(columna_lider).agg({
-        "Nombres y apellidos completos": "count",
-        "Llamada realizada y contestada (SI/NO)": lambda x: (x == "SI").sum(),
-        "Ubicado en célula o Grupo Go! (SI/NO)": lambda x: (x == "SI").sum(),
-        "Visita realizada (SI/NO)": lambda x: (x == "SI").sum()
-    }).reset_index()
-    
-    lideres_stats.columns = ["Líder", "Nuevos", "Llamadas", "Célula", "Visitas"]
-    
-    # Calcular porcentajes
-    lideres_stats["% Llamadas"] = (lideres_stats["Llamadas"] / lideres_stats["Nuevos"] * 100).round(1)
-    lideres_stats["% Célula"] = (lideres_stats["Célula"] / lideres_stats["Nuevos"] * 100).round(1)
-    lideres_stats["% Visitas"] = (lideres_stats["Visitas"] / lideres_stats["Nuevos"] * 100).round(1)
+    # Métricas por líder
+    lideres_stats = vista["lideres_stats"]
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Gráfico de barras comparativo
-        fig_lideres = px.bar(
-            lideres_stats,
-            x="Líder",
-            y=["Nuevos", "Llamadas", "Célula", "Visitas"],
-            title=f"Gestión por {columna_lider}",
-            barmode="group"
-        )
-        fig_lideres.update_layout(xaxis_title="Líder", yaxis_title="Cantidad")
+        fig_lideres = build_group_fig(lideres_stats, "Líder", f"Gestión por {columna_lider}")
         st.plotly_chart(fig_lideres, use_container_width=True)
     
     with col2:
@@ -535,37 +880,22 @@ cols = st.columns(num_cols)
 with cols[0]:
     # Distribución por grupo de edad
     if "Grupo_Edad" in df_filtrado.columns:
-        grupos_dist = df_filtrado["Grupo_Edad"].value_counts()
-        fig_grupos = px.pie(
-            values=grupos_dist.values,
-            names=grupos_dist.index,
-            title="Distribución por Grupo de Edad"
-        )
+        grupos_dist = vista["grupos_dist"]
+        fig_grupos = build_pie_fig(grupos_dist, "Distribución por Grupo de Edad")
         st.plotly_chart(fig_grupos, use_container_width=True)
 
 with cols[1]:
     # Top 10 barrios
     if "Barrio" in df_filtrado.columns:
-        barrios_top = df_filtrado["Barrio"].value_counts().head(10)
-        fig_barrios = px.bar(
-            x=barrios_top.values,
-            y=barrios_top.index,
-            orientation="h",
-            title="Top 10 Barrios",
-            labels={"x": "Cantidad", "y": "Barrio"}
-        )
-        st.plotly_chart(fig_barrios, use_container_width=True)
+        barrios_top = vista["barrios_top"]
+        st.plotly_chart(build_barrios_fig(barrios_top), use_container_width=True)
 
 # Si hay información de reuniones, mostrar análisis adicional
 if columna_reunion and num_cols == 3:
     with cols[2]:
         # Distribución por reunión
-        reunion_dist = df_filtrado["Reunion"].value_counts()
-        fig_reunion = px.pie(
-            values=reunion_dist.values,
-            names=reunion_dist.index,
-            title="Distribución por Reunión"
-        )
+        reunion_dist = vista["reunion_dist"]
+        fig_reunion = build_pie_fig(reunion_dist, "Distribución por Reunión")
         st.plotly_chart(fig_reunion, use_container_width=True)
 
 # Análisis cruzado por reunión (si existe)
@@ -573,32 +903,13 @@ if columna_reunion:
     st.subheader("🏛️ Análisis por Reunión")
     
     # Métricas por reunión
-    reunion_stats = df_filtrado.groupby("Reunion").agg({
-        "Nombres y apellidos completos": "count",
-        "Llamada realizada y contestada (SI/NO)": lambda x: (x == "SI").sum(),
-        "Ubicado en célula o Grupo Go! (SI/NO)": lambda x: (x == "SI").sum(),
-        "Visita realizada (SI/NO)": lambda x: (x == "SI").sum()
-    }).reset_index()
-    
-    reunion_stats.columns = ["Reunión", "Nuevos", "Llamadas", "Célula", "Visitas"]
-    
-    # Calcular porcentajes
-    reunion_stats["% Llamadas"] = (reunion_stats["Llamadas"] / reunion_stats["Nuevos"] * 100).round(1)
-    reunion_stats["% Célula"] = (reunion_stats["Célula"] / reunion_stats["Nuevos"] * 100).round(1)
-    reunion_stats["% Visitas"] = (reunion_stats["Visitas"] / reunion_stats["Nuevos"] * 100).round(1)
+    reunion_stats = vista["reunion_stats"]
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Gráfico de barras por reunión
-        fig_reunion_stats = px.bar(
-            reunion_stats,
-            x="Reunión",
-            y=["Nuevos", "Llamadas", "Célula", "Visitas"],
-            title="Gestión por Reunión",
-            barmode="group"
-        )
-        fig_reunion_stats.update_layout(xaxis_title="Reunión", yaxis_title="Cantidad")
+        fig_reunion_stats = build_group_fig(reunion_stats, "Reunión", "Gestión por Reunión")
         st.plotly_chart(fig_reunion_stats, use_container_width=True)
     
     with col2:
@@ -608,51 +919,75 @@ if columna_reunion:
 # --------------------------
 # 9. Datos detallados
 # --------------------------
-with st.expander("📋 Ver Datos Detallados"):
-    st.subheader(f"Datos Filtrados ({len(df_filtrado)} registros)")
-    
-    # Seleccionar columnas relevantes para mostrar
-    columnas_base = [
-        "Marca temporal", "Nombres y apellidos completos", 
-        "No. de Celular", "Tú eres:", "Quién te Invito?", 
-        "¿En qué barrio vives?",
-        "Llamada realizada y contestada (SI/NO)",
-        "Ubicado en célula o Grupo Go! (SI/NO)",
-        "Visita realizada (SI/NO)"
-    ]
-    
-    # Agregar columnas dinámicamente detectadas
-    if columna_lider:
-        columnas_base.append(columna_lider)
-    if columna_reunion:
-        columnas_base.append(columna_reunion)
-    if columna_notas:
-        columnas_base.append(columna_notas)
-    
-    columnas_disponibles = [col for col in columnas_base if col in df_filtrado.columns]
-    
-    # Mostrar tabla con columnas ordenadas
-    st.dataframe(df_filtrado[columnas_disponibles], use_container_width=True)
-    
-    # Mostrar información adicional sobre las notas si existen
-    if columna_notas and columna_notas in df_filtrado.columns:
-        notas_con_contenido = df_filtrado[columna_notas].dropna()
-        notas_no_vacias = notas_con_contenido[notas_con_contenido.str.strip() != ""]
-        st.info(f"📝 **Registros con notas:** {len(notas_no_vacias)} de {len(df_filtrado)}")
-    
-    # Botón para descargar
-    csv = df_filtrado.to_csv(index=False)
-    
-    # Crear nombre de archivo basado en los filtros aplicados
-    años_texto = "_".join(map(str, años_seleccionados)) if años_seleccionados else "todos"
-    nombre_archivo = f"consolidacion_filtrada_{años_texto}_{mes_inicio}_{mes_fin}.csv"
-    
-    st.download_button(
-        label="💾 Descargar datos filtrados (CSV)",
-        data=csv,
-        file_name=nombre_archivo,
-        mime="text/csv"
-    )
+@st.cache_data(ttl=TTL_CACHE)
+def to_csv_bytes(_df, clave):
+    """CSV de los datos filtrados, serializado una vez por versión de datos y combinación de filtros"""
+    return _df.drop(columns=INDICADORES_SINO).to_csv(index=False).encode("utf-8")
+
+@st.cache_data(ttl=TTL_CACHE)
+def to_parquet_bytes(_df, clave):
+    """Parquet (snappy) de los datos filtrados: más liviano que el CSV y conserva los tipos"""
+    buffer = io.BytesIO()
+    _df.drop(columns=INDICADORES_SINO).to_parquet(buffer, engine="pyarrow", compression="snappy", index=False)
+    return buffer.getvalue()
+
+# Fragmento: pulsar el botón de descarga solo vuelve a ejecutar esta sección,
+# no todo el script con sus gráficos
+@st.fragment
+def render_detalle(df_filtrado, clave_filtros, columna_lider, columna_reunion, columna_notas, nombre_archivo):
+    """Muestra la tabla de datos filtrados y el botón de descarga"""
+    with st.expander("📋 Ver Datos Detallados"):
+        st.subheader(f"Datos Filtrados ({len(df_filtrado)} registros)")
+        
+        # Seleccionar columnas relevantes para mostrar
+        columnas_base = [
+            "Marca temporal", "Nombres y apellidos completos", 
+            "No. de Celular", "Tú eres:", "Quién te Invito?", 
+            "¿En qué barrio vives?",
+            "Llamada realizada y contestada (SI/NO)",
+            "Ubicado en célula o Grupo Go! (SI/NO)",
+            "Visita realizada (SI/NO)"
+        ]
+        
+        # Agregar columnas dinámicamente detectadas
+        if columna_lider:
+            columnas_base.append(columna_lider)
+        if columna_reunion:
+            columnas_base.append(columna_reunion)
+        if columna_notas:
+            columnas_base.append(columna_notas)
+        
+        columnas_disponibles = [col for col in columnas_base if col in df_filtrado.columns]
+        
+        # Mostrar tabla con columnas ordenadas
+        st.dataframe(df_filtrado[columnas_disponibles], use_container_width=True)
+        
+        # Mostrar información adicional sobre las notas si existen
+        if columna_notas and columna_notas in df_filtrado.columns:
+            notas_con_contenido = df_filtrado[columna_notas].dropna()
+            notas_no_vacias = notas_con_contenido[notas_con_contenido.str.strip() != ""]
+            st.info(f"📝 **Registros con notas:** {len(notas_no_vacias)} de {len(df_filtrado)}")
+        
+        # Botones para descargar (los archivos se reutilizan mientras no cambien los filtros)
+        col_csv, col_parquet = st.columns(2)
+        col_csv.download_button(
+            label="💾 Descargar datos filtrados (CSV)",
+            data=to_csv_bytes(df_filtrado, clave_filtros),
+            file_name=f"{nombre_archivo}.csv",
+            mime="text/csv"
+        )
+        col_parquet.download_button(
+            label="📦 Descargar datos filtrados (Parquet)",
+            data=to_parquet_bytes(df_filtrado, clave_filtros),
+            file_name=f"{nombre_archivo}.parquet",
+            mime="application/octet-stream"
+        )
+
+# Crear nombre de archivo (sin extensión) basado en los filtros aplicados
+años_texto = "_".join(map(str, años_seleccionados)) if años_seleccionados else "todos"
+nombre_archivo = f"consolidacion_filtrada_{años_texto}_{mes_inicio}_{mes_fin}"
+
+render_detalle(df_filtrado, clave_filtros, columna_lider, columna_reunion, columna_notas, nombre_archivo)
 
 # --------------------------
 # 10. Footer con información
@@ -671,11 +1006,9 @@ with st.expander("🔍 Debug - Información de fechas"):
     if not df.empty:
         # Mostrar ejemplos de fechas originales vs procesadas
         muestra_fechas = df[["Marca temporal"]].head(10).copy()
-        if "Marca temporal" in df.columns:
-            # Obtener datos originales para comparar
-            df_original = pd.read_csv(sheet_url)
-            if "Marca temporal" in df_original.columns:
-                muestra_fechas["Fecha_Original"] = df_original["Marca temporal"].head(10)
+        if fechas_originales:
+            # Textos originales guardados durante la carga (sin volver a descargar)
+            muestra_fechas["Fecha_Original"] = fechas_originales
         
         debug_info = {
             "Total registros originales": len(df),